@@ -3,11 +3,11 @@ from streamlit_option_menu import option_menu
 import pandas as pd
 from datetime import date
 import os
-import json
 
 import plots
 import text
 from utilities import load_css
+from geometry import read_topology, pick_zoom_level, topology_to_geojson
 
 __version__ = "0.0.7"
 __author__ = "Lukas Calmbach"
@@ -26,7 +26,9 @@ KEHRICHT = "Hauskehricht + Sperrgut"
 FIRST_YEAR = 2018
 INTRO_IMAGE = "./waste.jpg"
 UNITS = {"menge_t": "Tonnen", "menge_kg_pro_kopf": "kg pro Kopf"}
-GEMEINDE_JSON = "./gemeinden.json"
+MAP_KEY = "choropleth_map"
+MAP_CENTER = [47.45, 7.65]
+MAP_ZOOM = 11
 
 
 def init():
@@ -266,8 +268,9 @@ def show_plots(df):
     elif plot_options.index(plot) == 3:
         filter = {"einheit": None, "jahr": None, "gemeinden": [], "kategorie": None}
         filter, filtered_df = get_filter(filter, df)
-        with open(GEMEINDE_JSON, "r") as json_file:
-            var_geojson = json.load(json_file)
+        view_center, view_zoom, bounds = get_map_view()
+        topology = get_topology(pick_zoom_level(view_zoom))
+        var_geojson = topology_to_geojson(topology, bounds)
         # Remove kanton for absoute unit, as it overwhelms all other numbers
         if (filter["einheit"] == "menge_t") & (filter["gemeinden"] == []):
             filtered_df = filtered_df[filtered_df["gemeinde"] != "Kanton"]
@@ -278,11 +281,44 @@ def show_plots(df):
             "var_geojson": var_geojson,
             "width": 1000,
             "height": 800,
-            "zoom": 11,
+            "center": MAP_CENTER,
+            "zoom": MAP_ZOOM,
+            "view_center": view_center,
+            "view_zoom": view_zoom,
+            "key": MAP_KEY,
         }
         result = plots.chloropleth_chart(filtered_df, settings)
 
 
+@st.cache_data()
+def get_topology(level):
+    return read_topology(level)
+
+
+def get_map_view():
+    """
+    Returns center, zoom and bounds ([west, south, east, north]) of the map as
+    reported by st_folium on the last interaction, or the defaults before the
+    map was first drawn.
+    """
+    view = st.session_state.get(MAP_KEY) or {}
+    center = view.get("center") or {}
+    bounds = view.get("bounds") or {}
+    south_west = bounds.get("_southWest") or {}
+    north_east = bounds.get("_northEast") or {}
+    corners = [
+        south_west.get("lng"),
+        south_west.get("lat"),
+        north_east.get("lng"),
+        north_east.get("lat"),
+    ]
+    return (
+        [center["lat"], center["lng"]] if center.get("lat") is not None else MAP_CENTER,
+        view.get("zoom") or MAP_ZOOM,
+        None if None in corners else corners,
+    )
+
+
 def get_total_df(_df, einheit, gemeinde):
     if gemeinde is not None:
         _df = _df[_df["gemeinde"] == gemeinde]
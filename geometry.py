@@ -0,0 +1,375 @@
+"""
+Commune boundaries for the choropleth map.
+
+The offline build step converts the GeoJSON boundary file into quantized,
+simplified TopoJSON files, one per zoom level. Shared borders between communes
+are stored only once as arcs. At render time the map picks the level matching
+its current zoom and decodes only the communes within the visible area. Run
+after the boundary file changes:
+
+    python geometry.py
+"""
+
+import json
+import math
+import os
+
+GEMEINDE_JSON = "./gemeinden.json"
+TOPOJSON_DIR = "./geodata"
+TOPOJSON_OBJECT = "gemeinden"
+ZOOM_LEVELS = [9, 11, 13]
+TILE_SIZE = 256
+# fraction of the view width/height added on each side before selecting
+# communes, so that small pans do not show empty borders
+VIEW_MARGIN = 0.5
+
+
+def topojson_file(zoom: int) -> str:
+    return os.path.join(TOPOJSON_DIR, f"{TOPOJSON_OBJECT}_z{zoom}.topojson")
+
+
+def pick_zoom_level(zoom: int) -> int:
+    """Returns the coarsest prebuilt level that is still detailed enough for zoom."""
+    for level in ZOOM_LEVELS:
+        if level >= zoom:
+            return level
+    return ZOOM_LEVELS[-1]
+
+
+def read_topology(level: int) -> dict:
+    with open(topojson_file(level), "r") as json_file:
+        return json.load(json_file)
+
+
+def get_polygons(geometry: dict) -> list:
+    """Returns the geometry as a list of polygons, each a list of rings."""
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+
+def get_bbox(polygons: list) -> list:
+    xs = [p[0] for polygon in polygons for ring in polygon for p in ring]
+    ys = [p[1] for polygon in polygons for ring in polygon for p in ring]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def remove_spikes(line: list) -> list:
+    """Removes repeated points and back-and-forth segments (A, B, A)."""
+    result = []
+    for point in line:
+        if result and result[-1] == point:
+            continue
+        if len(result) >= 2 and result[-2] == point:
+            result.pop()
+            continue
+        result.append(point)
+    return result
+
+
+def clean_ring(ring: list) -> list:
+    """Removes spikes from a closed ring, including those across its start point."""
+    points = remove_spikes(ring[:-1])
+    while len(points) >= 3:
+        if points[0] == points[-1]:
+            points = points[:-1]
+        elif points[1] == points[-1]:
+            points = points[1:-1]
+        elif points[0] == points[-2]:
+            points = points[:-2]
+        else:
+            break
+    if len(points) < 3:
+        return []
+    return points + [points[0]]
+
+
+def quantize_ring(ring: list, translate: list, scale: list) -> list:
+    return clean_ring(
+        [
+            (
+                round((x - translate[0]) / scale[0]),
+                round((y - translate[1]) / scale[1]),
+            )
+            for x, y in ring
+        ]
+    )
+
+
+def quantize_polygon(polygon: list, translate: list, scale: list) -> list:
+    """Quantizes all rings, dropping the polygon if its exterior ring collapses."""
+    rings = [quantize_ring(ring, translate, scale) for ring in polygon]
+    if not rings[0]:
+        return []
+    return [rings[0]] + [ring for ring in rings[1:] if ring]
+
+
+def find_junctions(rings: list) -> set:
+    """
+    A point is a junction if it is used by rings with different neighbours,
+    i.e. where a border shared by two communes starts or ends.
+    """
+    neighbours = {}
+    for ring in rings:
+        points = ring[:-1]
+        n = len(points)
+        for i, point in enumerate(points):
+            pair = frozenset([points[i - 1], points[(i + 1) % n]])
+            neighbours.setdefault(point, set()).add(pair)
+    return {point for point, pairs in neighbours.items() if len(pairs) > 1}
+
+
+def split_ring(ring: list, junctions: set) -> list:
+    points = ring[:-1]
+    cuts = [i for i, point in enumerate(points) if point in junctions]
+    if not cuts:
+        # ring without shared borders: start at the smallest point so that
+        # identical rings produce identical arcs
+        start = points.index(min(points))
+        points = points[start:] + points[:start]
+        return [points + [points[0]]]
+    points = points[cuts[0]:] + points[: cuts[0]]
+    points.append(points[0])
+    lines, line = [], [points[0]]
+    for point in points[1:]:
+        line.append(point)
+        if point in junctions:
+            lines.append(line)
+            line = [point]
+    return lines
+
+
+def perpendicular_distance(point, start, end) -> float:
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    cross = dy * point[0] - dx * point[1] + end[0] * start[1] - end[1] * start[0]
+    return abs(cross) / math.hypot(dx, dy)
+
+
+def simplify(line: list, tolerance: float) -> list:
+    """Douglas-Peucker simplification, endpoints are always kept."""
+    if len(line) < 3:
+        return line
+    keep = [False] * len(line)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(line) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_dist, index = 0, None
+        for i in range(first + 1, last):
+            dist = perpendicular_distance(line[i], line[first], line[last])
+            if dist > max_dist:
+                max_dist, index = dist, i
+        if index is not None and max_dist > tolerance:
+            keep[index] = True
+            stack += [(first, index), (index, last)]
+    result = remove_spikes([point for point, k in zip(line, keep) if k])
+    # an arc must keep its endpoints, closed arcs need at least 4 points to
+    # remain a valid ring
+    if result[0] != line[0] or result[-1] != line[-1]:
+        return line
+    if line[0] == line[-1] and len(result) < 4:
+        return line
+    return result
+
+
+def delta_encode(line: list) -> list:
+    result = [list(line[0])]
+    for prev, point in zip(line, line[1:]):
+        result.append([point[0] - prev[0], point[1] - prev[1]])
+    return result
+
+
+def delta_decode(arc: list) -> list:
+    x, y, result = 0, 0, []
+    for dx, dy in arc:
+        x, y = x + dx, y + dy
+        result.append((x, y))
+    return result
+
+
+def get_rings(geometry: dict) -> list:
+    if geometry["type"] == "Polygon":
+        return geometry["arcs"]
+    return [ring for polygon in geometry["arcs"] for ring in polygon]
+
+
+def find_spike_arcs(ring_arcs: list, arcs: list) -> set:
+    """Returns the arcs involved in back-and-forth segments where arcs meet."""
+    points, owners = [], []
+    for index in ring_arcs:
+        arc = index if index >= 0 else ~index
+        line = arcs[arc] if index >= 0 else arcs[arc][::-1]
+        points += line[1:]
+        owners += [arc] * (len(line) - 1)
+    n = len(points)
+    result = set()
+    for i in range(n):
+        if points[i - 1] == points[(i + 1) % n]:
+            result.update([owners[i - 1], owners[i], owners[(i + 1) % n]])
+    return result
+
+
+def simplify_arcs(arcs: list, geometries: list) -> list:
+    """
+    Simplifies all arcs. Simplifying two neighbouring arcs independently can
+    create a spike at their common junction, such arcs are reverted to their
+    original points until no spikes are left.
+    """
+    simplified = [simplify(arc, tolerance=2) for arc in arcs]
+    rings = [ring for geometry in geometries for ring in get_rings(geometry)]
+    while True:
+        spike_arcs = set()
+        for ring in rings:
+            spike_arcs |= find_spike_arcs(ring, simplified)
+        spike_arcs = {i for i in spike_arcs if simplified[i] is not arcs[i]}
+        if not spike_arcs:
+            return simplified
+        for i in spike_arcs:
+            simplified[i] = arcs[i]
+
+
+def build_topology(geojson: dict, zoom: int) -> dict:
+    """
+    Builds a TopoJSON topology from a GeoJSON FeatureCollection of polygons and
+    multipolygons. Coordinates are quantized to half a screen pixel at the given
+    zoom level and arcs are simplified with a tolerance of one pixel. The
+    latitude step is scaled by cos(latitude), as a Web Mercator pixel covers
+    fewer degrees of latitude than of longitude.
+    """
+    features = geojson["features"]
+    feature_polygons = [get_polygons(f["geometry"]) for f in features]
+    bbox = get_bbox([p for polygons in feature_polygons for p in polygons])
+    pixel_deg = 360 / (TILE_SIZE * 2**zoom)
+    center_lat = math.radians((bbox[1] + bbox[3]) / 2)
+    translate = bbox[:2]
+    scale = [pixel_deg / 2, pixel_deg / 2 * math.cos(center_lat)]
+
+    quantized = []
+    for polygons in feature_polygons:
+        polygons = [quantize_polygon(p, translate, scale) for p in polygons]
+        quantized.append([p for p in polygons if p])
+    junctions = find_junctions(
+        [ring for polygons in quantized for polygon in polygons for ring in polygon]
+    )
+
+    arcs, arc_index = [], {}
+    geometries = []
+    for feature, source, polygons in zip(features, feature_polygons, quantized):
+        polygon_arcs = []
+        for polygon in polygons:
+            ring_arcs = []
+            for ring in polygon:
+                line_arcs = []
+                for line in split_ring(ring, junctions):
+                    key = tuple(line)
+                    if key in arc_index:
+                        line_arcs.append(arc_index[key])
+                    elif key[::-1] in arc_index:
+                        line_arcs.append(~arc_index[key[::-1]])
+                    else:
+                        arc_index[key] = len(arcs)
+                        line_arcs.append(len(arcs))
+                        arcs.append(line)
+                ring_arcs.append(line_arcs)
+            polygon_arcs.append(ring_arcs)
+        geometry = {
+            "id": feature["id"],
+            "bbox": get_bbox(source),
+            "properties": feature["properties"],
+        }
+        if len(polygon_arcs) == 1:
+            geometry.update({"type": "Polygon", "arcs": polygon_arcs[0]})
+        else:
+            geometry.update({"type": "MultiPolygon", "arcs": polygon_arcs})
+        geometries.append(geometry)
+
+    return {
+        "type": "Topology",
+        "bbox": bbox,
+        "transform": {"scale": scale, "translate": translate},
+        "objects": {
+            TOPOJSON_OBJECT: {"type": "GeometryCollection", "geometries": geometries}
+        },
+        "arcs": [delta_encode(arc) for arc in simplify_arcs(arcs, geometries)],
+    }
+
+
+def in_view(bbox: list, bounds: list) -> bool:
+    """bounds is [west, south, east, north], expanded by VIEW_MARGIN."""
+    dx = (bounds[2] - bounds[0]) * VIEW_MARGIN
+    dy = (bounds[3] - bounds[1]) * VIEW_MARGIN
+    return not (
+        bbox[2] < bounds[0] - dx
+        or bbox[0] > bounds[2] + dx
+        or bbox[3] < bounds[1] - dy
+        or bbox[1] > bounds[3] + dy
+    )
+
+
+def topology_to_geojson(topology: dict, bounds: list | None = None) -> dict:
+    """
+    Decodes the communes of a topology into a GeoJSON FeatureCollection. If
+    bounds ([west, south, east, north]) is given, only communes in view are
+    decoded. If no commune is in view, e.g. after panning away from the canton,
+    all communes are returned.
+    """
+    scale = topology["transform"]["scale"]
+    translate = topology["transform"]["translate"]
+    decoded = {}
+
+    def decode_arc(index):
+        if index not in decoded:
+            decoded[index] = [
+                [
+                    round(x * scale[0] + translate[0], 6),
+                    round(y * scale[1] + translate[1], 6),
+                ]
+                for x, y in delta_decode(topology["arcs"][index])
+            ]
+        return decoded[index]
+
+    def decode_ring(ring_arcs):
+        ring = []
+        for index in ring_arcs:
+            line = decode_arc(index) if index >= 0 else decode_arc(~index)[::-1]
+            ring += line if not ring else line[1:]
+        return ring
+
+    geometries = topology["objects"][TOPOJSON_OBJECT]["geometries"]
+    if bounds is not None:
+        geometries = [g for g in geometries if in_view(g["bbox"], bounds)] or geometries
+    features = []
+    for geometry in geometries:
+        if geometry["type"] == "Polygon":
+            coordinates = [decode_ring(r) for r in geometry["arcs"]]
+        else:
+            coordinates = [[decode_ring(r) for r in p] for p in geometry["arcs"]]
+        features.append(
+            {
+                "type": "Feature",
+                "id": geometry["id"],
+                "geometry": {"type": geometry["type"], "coordinates": coordinates},
+                "properties": dict(geometry["properties"]),
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def main():
+    with open(GEMEINDE_JSON, "r") as json_file:
+        geojson = json.load(json_file)
+    os.makedirs(TOPOJSON_DIR, exist_ok=True)
+    for zoom in ZOOM_LEVELS:
+        topology = build_topology(geojson, zoom)
+        with open(topojson_file(zoom), "w") as json_file:
+            json.dump(topology, json_file, separators=(",", ":"))
+        size = os.path.getsize(topojson_file(zoom))
+        print(f"zoom {zoom}: {len(topology['arcs'])} arcs, {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import altair as alt
 import folium
+from branca.colormap import linear
 from streamlit_folium import st_folium
 
 MONTHS_REV_DICT = {
@@ -27,41 +28,59 @@ def chloropleth_chart(df, settings):
     for col in df_plot.columns:
         df_plot[col] = df_plot[col].replace('( )', -1)
         df_plot[col] = df_plot[col].astype('float64')
+    values = df_plot.set_index("BFS_Nummer")[settings["selected_variable"]]
+    colormap = linear.OrRd_09.scale(values.min(), values.max()).to_step(6)
+    colormap.caption = settings["selected_variable"]
 
-    # center on Liberty Bell
-    coordinates = [47.45, 7.65]
-    # coordinates = [43, -100]
-
-    m = folium.Map(location=coordinates, zoom_start=settings["zoom"])
-    cp = folium.Choropleth(
-        geo_data=settings["var_geojson"],
-        name=settings["selected_variable"],
-        data=df_plot,
-        columns=["BFS_Nummer", settings["selected_variable"]],
-        key_on="feature.id",
-        fill_color="OrRd",
-        fill_opacity=0.8,
-        line_opacity=0.2,
-        highlight=True,
-    ).add_to(m)
+    m = folium.Map(location=settings["center"], zoom_start=settings["zoom"])
+    colormap.add_to(m)
 
     df = df.set_index("BFS_Nummer")
-    for s in cp.geojson.data["features"]:
+    for s in settings["var_geojson"]["features"]:
         try:
             value = float(df.loc[s["id"], settings["selected_variable"]])
             s["properties"][settings["selected_variable"]] = value
         except:
             st.write(s["id"])
-    folium.GeoJsonTooltip(
-        ["Gemeinde", "BFS_Nummer", settings["selected_variable"]]
-    ).add_to(cp.geojson)
-    folium.LayerControl().add_to(m)
-    st_data = st_folium(m, height=settings["height"], width=settings["width"])
+
+    def style_function(feature):
+        value = values.get(feature["id"])
+        return {
+            "fillColor": "black" if value is None else colormap(value),
+            "color": "black",
+            "weight": 1,
+            "fillOpacity": 0.8,
+            "opacity": 0.2,
+        }
+
+    fg = folium.FeatureGroup(name=settings["selected_variable"])
+    layer = folium.GeoJson(
+        settings["var_geojson"],
+        style_function=style_function,
+        highlight_function=lambda feature: {"weight": 3, "fillOpacity": 1.0},
+    ).add_to(fg)
+    if settings["var_geojson"]["features"]:
+        folium.GeoJsonTooltip(
+            ["Gemeinde", "BFS_Nummer", settings["selected_variable"]]
+        ).add_to(layer)
+    # the map only depends on the data, view and communes in view are passed
+    # separately so that panning and zooming do not reload the map
+    st_data = st_folium(
+        m,
+        height=settings["height"],
+        width=settings["width"],
+        key=settings["key"],
+        center=settings["view_center"],
+        zoom=settings["view_zoom"],
+        feature_group_to_add=fg,
+        layer_control=folium.LayerControl(),
+    )
     if not st_data["last_active_drawing"] is None:
         return st_data["last_active_drawing"]["id"]
     else:
         return 0
 
+
 def line_chart(df, settings):
     title = settings["title"] if "title" in settings else ""
     if "x_dt" not in settings:
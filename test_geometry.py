@@ -0,0 +1,145 @@
+import json
+import os
+
+import pytest
+
+import geometry
+
+GEMEINDE_JSON = os.path.join(os.path.dirname(__file__), "gemeinden.json")
+
+
+def square(x, y, size=0.01):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def feature(id, geometry_type, coordinates):
+    return {
+        "type": "Feature",
+        "id": id,
+        "properties": {"BFS_Nummer": id},
+        "geometry": {"type": geometry_type, "coordinates": coordinates},
+    }
+
+
+def spikes(ring):
+    points = ring[:-1]
+    n = len(points)
+    return sum(points[i - 1] == points[(i + 1) % n] for i in range(n))
+
+
+def rings(feature):
+    if feature["geometry"]["type"] == "Polygon":
+        return feature["geometry"]["coordinates"]
+    return [r for polygon in feature["geometry"]["coordinates"] for r in polygon]
+
+
+def test_find_junctions_marks_ends_of_shared_border():
+    left = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+    right = [(1, 0), (2, 0), (2, 1), (1, 1), (1, 0)]
+    assert geometry.find_junctions([left, right]) == {(1, 0), (1, 1)}
+
+
+def test_split_ring_at_junctions():
+    ring = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+    lines = geometry.split_ring(ring, {(1, 0), (1, 1)})
+    assert lines == [[(1, 0), (1, 1)], [(1, 1), (0, 1), (0, 0), (1, 0)]]
+
+
+def test_split_ring_without_junctions_starts_at_smallest_point():
+    ring = [(1, 1), (0, 1), (0, 0), (1, 0), (1, 1)]
+    assert geometry.split_ring(ring, set()) == [
+        [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+    ]
+
+
+def test_clean_ring_removes_spikes():
+    ring = [(0, 0), (2, 0), (3, 0), (2, 0), (2, 2), (0, 2), (0, 0)]
+    assert geometry.clean_ring(ring) == [(0, 0), (2, 0), (2, 2), (0, 2), (0, 0)]
+
+
+def test_clean_ring_removes_spike_across_start():
+    ring = [(5, 5), (0, 0), (2, 0), (2, 2), (0, 0), (5, 5)]
+    assert geometry.clean_ring(ring) == [(0, 0), (2, 0), (2, 2), (0, 0)]
+
+
+def test_clean_ring_drops_collapsed_ring():
+    assert geometry.clean_ring([(0, 0), (1, 0), (0, 0), (0, 0)]) == []
+
+
+def test_simplify_arcs_reverts_spike_at_junction():
+    # each arc alone simplifies to a straight line, together they would form
+    # the spike (0, 0), (10, 0), (0, 0)
+    arcs = [[(0, 0), (5, 0), (10, 0)], [(10, 0), (5, 1), (0, 0)]]
+    geometries = [{"type": "Polygon", "arcs": [[0, 1]]}]
+    simplified = geometry.simplify_arcs(arcs, geometries)
+    assert simplified == arcs
+    assert geometry.find_spike_arcs([0, 1], simplified) == set()
+
+
+def test_in_view():
+    bounds = [7.0, 47.0, 8.0, 48.0]
+    assert geometry.in_view([7.5, 47.5, 7.6, 47.6], bounds)
+    # within the margin of half the view size
+    assert geometry.in_view([8.3, 47.5, 8.4, 47.6], bounds)
+    assert not geometry.in_view([8.6, 47.5, 8.7, 47.6], bounds)
+
+
+def test_round_trip():
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            feature(1, "Polygon", [square(7.50, 47.40)]),
+            feature(2, "Polygon", [square(7.51, 47.40)]),
+            feature(3, "MultiPolygon", [[square(7.60, 47.40)], [square(7.70, 47.40)]]),
+        ],
+    }
+    topology = geometry.build_topology(geojson, 11)
+    # the border between commune 1 and 2 is stored once
+    assert len(topology["arcs"]) == 5
+    result = geometry.topology_to_geojson(topology)
+    assert [f["id"] for f in result["features"]] == [1, 2, 3]
+    assert [f["geometry"]["type"] for f in result["features"]] == [
+        "Polygon",
+        "Polygon",
+        "MultiPolygon",
+    ]
+    for f in result["features"]:
+        for ring in rings(f):
+            assert ring[0] == ring[-1] and len(ring) >= 4
+            assert spikes(ring) == 0
+
+
+def test_topology_to_geojson_selects_communes_in_view():
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            feature(1, "Polygon", [square(7.50, 47.40)]),
+            feature(2, "Polygon", [square(7.90, 47.40)]),
+        ],
+    }
+    topology = geometry.build_topology(geojson, 11)
+    in_view = geometry.topology_to_geojson(topology, [7.49, 47.39, 7.52, 47.42])
+    assert [f["id"] for f in in_view["features"]] == [1]
+    # nothing in view falls back to all communes
+    off_view = geometry.topology_to_geojson(topology, [8.4, 47.3, 9.1, 47.65])
+    assert [f["id"] for f in off_view["features"]] == [1, 2]
+
+
+def test_unsupported_geometry_type():
+    geojson = {"features": [feature(1, "Point", [7.5, 47.4])]}
+    with pytest.raises(ValueError, match="Point"):
+        geometry.build_topology(geojson, 11)
+
+
+@pytest.mark.parametrize("zoom", geometry.ZOOM_LEVELS)
+def test_round_trip_gemeinden(zoom):
+    with open(GEMEINDE_JSON, "r") as json_file:
+        geojson = json.load(json_file)
+    result = geometry.topology_to_geojson(geometry.build_topology(geojson, zoom))
+    assert [f["id"] for f in result["features"]] == [
+        f["id"] for f in geojson["features"]
+    ]
+    for f in result["features"]:
+        for ring in rings(f):
+            assert ring[0] == ring[-1] and len(ring) >= 4
+            assert spikes(ring) == 0